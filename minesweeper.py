@@ -1,7 +1,85 @@
+import collections
+import functools
 import itertools
 import random
 import time
 
+# Row and column offsets of the eight cells around a cell
+_OFFSETS = (
+    (-1, -1), (-1, 0), (-1, 1),
+    (0, -1), (0, 1),
+    (1, -1), (1, 0), (1, 1),
+)
+
+# Shared result for sentences that tell us nothing definite
+_EMPTY = frozenset()
+
+
+def cell_bit(cell, width, height=None):
+    """
+    Returns the bitmask with only the bit of `cell` set,
+    for a board of the given width (and height, if given).
+    Raises ValueError if the cell does not fit on that board.
+    """
+    i, j = cell
+    if not 0 <= j < width or i < 0 or height is not None and i >= height:
+        raise ValueError(f"cell {cell} is outside the board")
+    return 1 << (i * width + j)
+
+
+def cells_to_bits(cells, width, height=None):
+    """
+    Returns the bitmask of an iterable of cells.
+    """
+    mask = 0
+    for cell in cells:
+        mask |= cell_bit(cell, width, height)
+    return mask
+
+
+def bit_indices(mask):
+    """
+    Yields the index of every bit set in `mask`, lowest first.
+    """
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def bits_to_cells(mask, width):
+    """
+    Returns the frozenset of cells whose bits are set in `mask`.
+    """
+    return frozenset(divmod(index, width) for index in bit_indices(mask))
+
+
+@functools.lru_cache(maxsize=None)
+def _neighbors(height, width, i, j):
+    """
+    Returns the tuple of cells within one row and column
+    of cell (i, j), not including the cell itself.
+    """
+    return tuple(
+        (i + di, j + dj)
+        for di, dj in _OFFSETS
+        if 0 <= i + di < height and 0 <= j + dj < width
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def neighbor_masks(height, width):
+    """
+    Returns a tuple holding, for each cell in row-major order,
+    the bitmask of its neighbours on a board of the given size.
+    The table is cached, so games and AIs of one size share it.
+    """
+    return tuple(
+        cells_to_bits(_neighbors(height, width, i, j), width)
+        for i in range(height)
+        for j in range(width)
+    )
+
 
 class Minesweeper():
     """
@@ -15,21 +93,14 @@ class Minesweeper():
         self.width = width
         self.mines = set()
 
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        # Initialize an empty field with no mines, one bit per cell
+        self.board_mask = 0
+        self.neighbor_masks = neighbor_masks(height, width)
 
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        # Add mines randomly, drawing distinct cells in one pass
+        for index in random.sample(range(height * width), mines):
+            self.mines.add(divmod(index, width))
+            self.board_mask |= 1 << index
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -42,7 +113,7 @@ class Minesweeper():
         for i in range(self.height):
             print("--" * self.width + "-")
             for j in range(self.width):
-                if self.board[i][j]:
+                if self.board_mask >> (i * self.width + j) & 1:
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -51,7 +122,7 @@ class Minesweeper():
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.board_mask >> (i * self.width + j) & 1)
 
     def nearby_mines(self, cell):
         """
@@ -59,24 +130,8 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
-
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        i, j = cell
+        return (self.board_mask & self.neighbor_masks[i * self.width + j]).bit_count()
 
     def won(self):
         """
@@ -90,14 +145,51 @@ class Sentence():
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    The cells are stored as a bitmask, one bit per board cell,
+    so that set operations become integer operations. Without a
+    board width, the mask is laid out on a board just wide enough
+    for the cells; sentences compare by their cells either way.
     """
 
-    def __init__(self, cells, count):
-        self.cells = set(cells)
+    __slots__ = ("width", "cells_mask", "count")
+
+    def __init__(self, cells, count, width=None):
+        cells = tuple(cells)
+        if width is None:
+            width = max((j + 1 for _, j in cells), default=1)
+        self.width = width
+        self.cells_mask = cells_to_bits(cells, width)
         self.count = count
 
+    @classmethod
+    def from_mask(cls, cells_mask, count, width):
+        """
+        Builds a sentence directly from a bitmask of cells.
+        """
+        sentence = cls.__new__(cls)
+        sentence.width = width
+        sentence.cells_mask = cells_mask
+        sentence.count = count
+        return sentence
+
+    @property
+    def cells(self):
+        return bits_to_cells(self.cells_mask, self.width)
+
+    @cells.setter
+    def cells(self, cells):
+        self.cells_mask = cells_to_bits(cells, self.width)
+
     def __eq__(self, other):
-        return self.cells == other.cells and self.count == other.count
+        if self.count != other.count:
+            return False
+        if self.width == other.width:
+            return self.cells_mask == other.cells_mask
+        return self.cells == other.cells
+
+    def __hash__(self):
+        return hash((self.cells, self.count))
 
     def __str__(self):
         return f"{self.cells} = {self.count}"
@@ -106,44 +198,69 @@ class Sentence():
         """
         Returns the set of all cells in self.cells known to be mines.
         """
-        mine_cells = set()
-        if self.count == len(self.cells):
-            for cell in self.cells:
-                mine_cells.add(cell)
-
-        return mine_cells
-        # raise NotImplementedError
+        if self.count and self.count == self.cells_mask.bit_count():
+            return self.cells
+        return _EMPTY
 
     def known_safes(self):
         """
         Returns the set of all cells in self.cells known to be safe.
         """
-        safe_cells = set()
         if self.count == 0:
-            for cell in self.cells:
-                safe_cells.add(cell)
-        return safe_cells
-        # raise NotImplementedError
+            return self.cells
+        return _EMPTY
 
     def mark_mine(self, cell):
         """
         Updates internal knowledge representation given the fact that
         a cell is known to be a mine.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        try:
+            bit = cell_bit(cell, self.width)
+        except ValueError:
+            return
+        if self.cells_mask & bit:
+            self.cells_mask ^= bit
             self.count = self.count - 1
-        
-        # raise NotImplementedError
 
     def mark_safe(self, cell):
         """
         Updates internal knowledge representation given the fact that
         a cell is known to be safe.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
-        # raise NotImplementedError
+        try:
+            bit = cell_bit(cell, self.width)
+        except ValueError:
+            return
+        if self.cells_mask & bit:
+            self.cells_mask ^= bit
+
+
+class Knowledge(dict):
+    """
+    The sentences an AI knows, keyed by their (cells_mask, count) pair.
+    Membership also accepts a Sentence, so `sentence in ai.knowledge`
+    holds just as it did when the knowledge was a list of sentences.
+    """
+
+    __slots__ = ("width", "height")
+
+    def __init__(self, width, height):
+        super().__init__()
+        self.width = width
+        self.height = height
+
+    def __contains__(self, item):
+        if isinstance(item, Sentence):
+            if item.width == self.width:
+                mask = item.cells_mask
+            else:
+                try:
+                    mask = cells_to_bits(item.cells, self.width, self.height)
+                except ValueError:
+                    return False
+            item = (mask, item.count)
+        return dict.__contains__(self, item)
 
 
 class MinesweeperAI():
@@ -151,121 +268,266 @@ class MinesweeperAI():
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    __slots__ = (
+        "height", "width", "total_mines", "neighbor_masks",
+        "moves_made_mask", "mines_mask", "safes_mask", "unexplored_mask",
+        "knowledge", "cell_index", "worklist", "queued", "verbose",
+    )
 
-        # Set initial height and width
+    def __init__(self, height=8, width=8, total_mines=None):
+
+        # Set initial height and width, and the number of mines
+        # on the board if the caller knows it
         self.height = height
         self.width = width
+        self.total_mines = total_mines
+
+        # Bitmask of the neighbours of each cell,
+        # by flat index i * width + j
+        self.neighbor_masks = neighbor_masks(height, width)
 
         # Keep track of which cells have been clicked on
-        self.moves_made = set()
+        self.moves_made_mask = 0
 
         # Keep track of cells known to be safe or mines
-        self.mines = set()
-        self.safes = set()
+        self.mines_mask = 0
+        self.safes_mask = 0
+
+        # Cells that are neither clicked on nor known to be mines
+        self.unexplored_mask = (1 << (height * width)) - 1
+
+        # With no mines on the board at all, every cell is safe
+        if total_mines == 0:
+            self.safes_mask = self.unexplored_mask
+
+        # Sentences about the game known to be true,
+        # keyed by their (cells_mask, count) pair
+        self.knowledge = Knowledge(width, height)
+
+        # For each cell index, the keys of the sentences mentioning it
+        self.cell_index = {}
+
+        # Sentences that are new or have changed since they were last
+        # compared with the rest of the knowledge
+        self.worklist = collections.deque()
+
+        # Identities of the sentences currently in the worklist
+        self.queued = set()
+
+        # Set to True to trace knowledge propagation in add_knowledge
+        self.verbose = False
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+    @property
+    def moves_made(self):
+        return bits_to_cells(self.moves_made_mask, self.width)
 
-        # The number of cells left to be clicked
-        self.pending_cells = height*width
+    @moves_made.setter
+    def moves_made(self, cells):
+        self.moves_made_mask = cells_to_bits(cells, self.width, self.height)
+        self.update_unexplored()
+
+    @property
+    def mines(self):
+        return bits_to_cells(self.mines_mask, self.width)
+
+    @mines.setter
+    def mines(self, cells):
+        self.mines_mask = cells_to_bits(cells, self.width, self.height)
+        self.update_unexplored()
+
+    @property
+    def safes(self):
+        return bits_to_cells(self.safes_mask, self.width)
+
+    @safes.setter
+    def safes(self, cells):
+        self.safes_mask = cells_to_bits(cells, self.width, self.height)
+
+    def update_unexplored(self):
+        """
+        Recomputes the unexplored cells from the moves made
+        and the known mines.
+        """
+        self.unexplored_mask = ((1 << (self.height * self.width)) - 1) & ~(
+            self.moves_made_mask | self.mines_mask
+        )
 
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
-        self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.mark_mines(cell_bit(cell, self.width, self.height))
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
-        self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self.mark_safes(cell_bit(cell, self.width, self.height))
 
-    def nearby_cells(self, cell):
+    def mark_mines(self, mask):
         """
-        Returns the list of neighbours 
-        of a given cell,
-        not including the cell itself.
+        Marks every cell whose bit is set in `mask` as a mine,
+        and updates all knowledge accordingly.
         """
-        neigh_cells = []
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
+        self.mark_cells(mask, 0)
 
-                # Ignore the cell itself and beyond the neighbour boundary
-                if (i, j) == cell or i < 0 or j < 0 or i >= self.height or j >= self.width:
-                    continue
+    def mark_safes(self, mask):
+        """
+        Marks every cell whose bit is set in `mask` as safe,
+        and updates all knowledge accordingly.
+        """
+        self.mark_cells(0, mask)
 
-                # Update neigh_cells 
-                neigh_cells.append((i, j))
-        return neigh_cells
+    def mark_cells(self, mines, safes):
+        """
+        Marks the cells in the `mines` and `safes` masks, then removes
+        them from every sentence holding any of them in a single pass,
+        so each affected sentence is rewritten and re-queued only once.
+        """
+        self.mines_mask |= mines
+        self.safes_mask |= safes
+        self.unexplored_mask &= ~mines
+
+        known = mines | safes
+        keys = set()
+        for index in bit_indices(known):
+            keys.update(self.cell_index.get(index, ()))
+        for key in keys:
+            sentence = self.remove_sentence(key)
+            sentence.count -= (sentence.cells_mask & mines).bit_count()
+            sentence.cells_mask &= ~known
+            if self.add_sentence(sentence):
+                self.queue_sentence(sentence)
+
+        # Once every mine is known, the other unexplored cells are safe
+        if (
+            mines
+            and self.total_mines is not None
+            and self.mines_mask.bit_count() >= self.total_mines
+        ):
+            rest = self.unexplored_mask & ~self.safes_mask
+            if rest:
+                self.mark_cells(0, rest)
+
+    def add_sentence(self, sentence):
+        """
+        Stores a sentence in the knowledge base and indexes its cells.
+        Returns False, storing nothing, if the sentence is empty
+        or already known.
+        """
+        key = (sentence.cells_mask, sentence.count)
+        if not sentence.cells_mask or self.knowledge.get(key) is not None:
+            return False
+        self.knowledge[key] = sentence
+        for index in bit_indices(sentence.cells_mask):
+            self.cell_index.setdefault(index, set()).add(key)
+        return True
+
+    def queue_sentence(self, sentence):
+        """
+        Adds a sentence to the worklist unless it is already waiting there.
+        """
+        if id(sentence) not in self.queued:
+            self.queued.add(id(sentence))
+            self.worklist.append(sentence)
+
+    def remove_sentence(self, key):
+        """
+        Removes the sentence stored under `key` from the knowledge base
+        and from the cell index, and returns it.
+        """
+        for index in bit_indices(key[0]):
+            self.cell_index[index].discard(key)
+        return self.knowledge.pop(key)
 
-    def removing_duplicates(self, item):
+    def nearby_cells(self, cell):
         """
-        Replace duplicates with empty cells
-        So that they can be removed in next cycle.
+        Returns the tuple of neighbours
+        of a given cell,
+        not including the cell itself.
         """
-        if self.knowledge.count(item) > 1:
-            count = 0
-            for i in range(len(self.knowledge)):
-                if item == self.knowledge[i]:
-                    count += 1
-                    if count > 1:
-                        self.knowledge[i].cells = set()
-                        self.knowledge[i].count = 0
+        return _neighbors(self.height, self.width, *cell)
 
     def infer_multiple_sentences(self):
-        empty_sets = []
-        newSelf_knowledge = []
-        for sentence in self.knowledge:
-            if len(sentence.cells) == 0:
-                empty_sets.append(sentence)
+        """
+        Works through the queued sentences, marking the cells a sentence
+        settles on its own and deriving new sentences from the pairs
+        where one sentence contains the other. Derived sentences join
+        the queue. Returns the number of sentences derived.
+        """
+        # Bind what the loop touches on every step to locals
+        knowledge = self.knowledge
+        cell_index = self.cell_index
+        queued = self.queued
+        worklist = self.worklist
+
+        derived = 0
+        while worklist:
+            sentence = worklist.popleft()
+            queued.discard(id(sentence))
+
+            # Skip sentences dropped since they were queued
+            key = (sentence.cells_mask, sentence.count)
+            if knowledge.get(key) is not sentence:
                 continue
-            if sentence.count == 0 or len(sentence.cells) == sentence.count:
-                for sf in sentence.known_safes():
-                    self.mark_safe(sf)
-                for mn in sentence.known_mines():
-                    self.mark_mine(mn) 
-                empty_sets.append(sentence)
-            
-            for nextSentence in self.knowledge:
-                if sentence == nextSentence:
+
+            cells = sentence.cells_mask
+            if sentence.count == 0:
+                self.mark_safes(cells)
+                continue
+            if cells.bit_count() == sentence.count:
+                self.mark_mines(cells)
+                continue
+
+            # Only sentences sharing a cell with this one
+            # can contain it or be contained in it
+            candidates = set().union(
+                *(cell_index[index] for index in bit_indices(cells))
+            )
+            candidates.discard(key)
+            for nextKey in candidates:
+
+                # Marks made along the way may have changed either sentence
+                nextSentence = knowledge.get(nextKey)
+                if nextSentence is None:
                     continue
+
+                # A queued sentence compares itself with this one once it
+                # is popped, so each pair is only examined once
+                if id(nextSentence) in queued:
+                    continue
+                if knowledge.get(key) is not sentence:
+                    break
+
+                # Find which of the two sentences contains the other
+                nextCells = nextSentence.cells_mask
+                shared = cells & nextCells
+                if shared == cells:
+                    sub, sup = sentence, nextSentence
+                elif shared == nextCells:
+                    sub, sup = nextSentence, sentence
                 else:
-                    if sentence.cells.issubset(nextSentence.cells) or sentence.cells.issuperset(nextSentence.cells):
-                        newCells = set()
-                        if sentence.cells.issubset(nextSentence.cells):
-                            newCells = nextSentence.cells.copy().difference(sentence.cells)
-                            leftover = sentence
-                        else:
-                            newCells = sentence.cells.copy().difference(nextSentence.cells)
-                            leftover = nextSentence
-                        if len(newCells):
-                            newCount = abs(nextSentence.count - sentence.count)
-                            newSentence = Sentence(newCells, newCount)
-                            if len(newCells) == newCount or newCount == 0:
-                                for sf in newSentence.known_safes():
-                                    self.mark_safe(sf)
-                                for mn in newSentence.known_mines():
-                                    self.mark_mine(mn)
-                                self.removing_duplicates(leftover)
-                            elif newSentence in self.knowledge or newSentence in newSelf_knowledge:
-                                continue
-                            else:
-                                newSelf_knowledge.append(newSentence) 
-       
-        for sent in empty_sets:
-            self.knowledge.remove(sent)
-
-        return newSelf_knowledge
+                    continue
 
+                # The cells only in the superset hold exactly
+                # the mines the subset does not account for
+                newCells = sup.cells_mask ^ sub.cells_mask
+                if not newCells:
+                    continue
+                newCount = sup.count - sub.count
+                if newCount == 0:
+                    self.mark_safes(newCells)
+                elif newCells.bit_count() == newCount:
+                    self.mark_mines(newCells)
+                elif knowledge.get((newCells, newCount)) is None:
+                    newSentence = Sentence.from_mask(newCells, newCount, self.width)
+                    self.add_sentence(newSentence)
+                    self.queue_sentence(newSentence)
+                    derived += 1
+
+        return derived
 
     def add_knowledge(self, cell, count):
         """
@@ -282,44 +544,33 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
-        newSelf_knowledge = []
-        self.moves_made.add(cell)
-        self.mark_safe(cell)
-        self.pending_cells -= 1
-
-        neigh_cells = self.nearby_cells(cell)
-        neigh_set = set()
-        neigh_count = count
-
-        if count == 0:
-            for neigh in neigh_cells:
-                self.mark_safe(neigh)
-        elif len(neigh_cells) == count:
-            for neigh in neigh_cells:
-                self.mark_mine(neigh)
+        bit = cell_bit(cell, self.width, self.height)
+        self.moves_made_mask |= bit
+        self.unexplored_mask &= ~bit
+
+        # Known mines leave the sentence and lower its count, while
+        # known safe cells (which include every move made) just leave it
+        neighbors = self.neighbor_masks[cell[0] * self.width + cell[1]]
+        neigh_count = count - (neighbors & self.mines_mask).bit_count()
+        neigh_mask = neighbors & ~(self.mines_mask | self.safes_mask)
+
+        # The cell itself is safe; mark it together with any
+        # neighbours the reduced sentence settles on its own
+        if neigh_count == 0:
+            self.mark_cells(0, bit | neigh_mask)
+        elif neigh_mask.bit_count() == neigh_count:
+            self.mark_cells(neigh_mask, bit)
         else:
-            for neigh in neigh_cells:
-                if neigh in self.mines:
-                    neigh_count = neigh_count - 1
-                    continue
-                if neigh in self.moves_made or neigh in self.safes:
-                    continue
-                neigh_set.add(neigh)
-            newSentence = Sentence(neigh_set, neigh_count)
-            if newSentence not in self.knowledge:
-                self.knowledge.append(newSentence)
-            
-        count = 0
-        while True:
-            count += 1
-            print("inside knowledge loop:",len(self.knowledge), "count:",count)
-            newSelf_knowledge = self.infer_multiple_sentences()
-            if len(newSelf_knowledge): 
-                print("have new knowledge",len(newSelf_knowledge))
-                self.knowledge += newSelf_knowledge
-            else:
-                print("break free")
-                break
+            self.mark_cells(0, bit)
+            newSentence = Sentence.from_mask(neigh_mask, neigh_count, self.width)
+            if self.add_sentence(newSentence):
+                self.queue_sentence(newSentence)
+
+        # Marks re-queue every sentence they change, so draining the
+        # worklist once reaches the same fixed point as repeated passes
+        derived = self.infer_multiple_sentences()
+        if __debug__ and self.verbose:
+            print("knowledge:", len(self.knowledge), "derived:", derived)
 
         # raise NotImplementedError
 
@@ -332,9 +583,10 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        for move in self.safes.difference(self.moves_made):
-            if move not in self.mines and move not in self.moves_made:
-                return move
+        # Safe cells and mines never overlap, so only moves need excluding
+        candidates = self.safes_mask & ~self.moves_made_mask
+        if candidates:
+            return divmod((candidates & -candidates).bit_length() - 1, self.width)
             
         return None
         # raise NotImplementedError
@@ -347,12 +599,10 @@ class MinesweeperAI():
             2) are not known to be mines
         """
 
-        while self.pending_cells - len(self.mines) > 0:
-            i = random.randrange(self.height)
-            j = random.randrange(self.width)
-            move = (i, j)
-            if move not in self.mines and move not in self.moves_made:
-                return move
+        # Pick a random set bit of the unexplored mask
+        if self.unexplored_mask:
+            index = random.choice(tuple(bit_indices(self.unexplored_mask)))
+            return divmod(index, self.width)
 
         return None
         # raise NotImplementedError
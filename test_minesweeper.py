@@ -0,0 +1,157 @@
+import itertools
+import random
+import unittest
+
+from minesweeper import Minesweeper, MinesweeperAI, Sentence
+
+
+class NaiveAI():
+    """
+    Reference player that keeps its sentences as sets of cells and
+    repeats every inference over the whole knowledge base until
+    nothing changes.
+    """
+
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self.mines = set()
+        self.safes = set()
+        self.knowledge = []
+
+    def add_knowledge(self, cell, count):
+        i, j = cell
+        cells = set()
+        for a, b in itertools.product(range(i - 1, i + 2), range(j - 1, j + 2)):
+            if (a, b) != cell and 0 <= a < self.height and 0 <= b < self.width:
+                cells.add((a, b))
+        self.safes.add(cell)
+        self.knowledge.append([cells, count])
+
+        changed = True
+        while changed:
+            changed = False
+
+            # Remove known cells from every sentence
+            for sentence in self.knowledge:
+                mines = sentence[0] & self.mines
+                sentence[0] -= mines | self.safes
+                sentence[1] -= len(mines)
+
+            # Mark the cells that a sentence settles on its own
+            for cells, count in self.knowledge:
+                if cells and count == 0 and not cells <= self.safes:
+                    self.safes |= cells
+                    changed = True
+                elif cells and len(cells) == count and not cells <= self.mines:
+                    self.mines |= cells
+                    changed = True
+
+            # Derive a sentence from every pair where one contains the other
+            known = {(frozenset(cells), count) for cells, count in self.knowledge if cells}
+            self.knowledge = [[set(cells), count] for cells, count in known]
+            for (cells, count), (other, otherCount) in itertools.permutations(known, 2):
+                if cells < other:
+                    derived = (other - cells, otherCount - count)
+                    if derived not in known:
+                        known.add(derived)
+                        self.knowledge.append([set(derived[0]), derived[1]])
+                        changed = True
+
+
+class TestSentence(unittest.TestCase):
+
+    def test_known_cells(self):
+        self.assertEqual(Sentence({(0, 0), (0, 1)}, 2).known_mines(), {(0, 0), (0, 1)})
+        self.assertEqual(Sentence({(0, 0), (0, 1)}, 0).known_safes(), {(0, 0), (0, 1)})
+        self.assertEqual(Sentence({(0, 0), (0, 1)}, 1).known_mines(), set())
+
+    def test_mark_cells(self):
+        sentence = Sentence({(0, 0), (0, 1), (1, 0)}, 2)
+        sentence.mark_mine((0, 0))
+        sentence.mark_safe((1, 0))
+        sentence.mark_mine((5, 9))
+        self.assertEqual(sentence, Sentence({(0, 1)}, 1))
+
+    def test_equality_ignores_width(self):
+        cells = {(0, 1), (1, 2)}
+        self.assertEqual(Sentence(cells, 1), Sentence(cells, 1, width=5))
+        self.assertEqual(hash(Sentence(cells, 1)), hash(Sentence(cells, 1, width=5)))
+        self.assertNotEqual(Sentence(cells, 1), Sentence(cells, 2, width=5))
+
+
+class TestMinesweeperAI(unittest.TestCase):
+
+    def test_zero_count_marks_neighbors_safe(self):
+        ai = MinesweeperAI(4, 5)
+        ai.add_knowledge((0, 0), 0)
+        self.assertEqual(ai.safes, {(0, 0), (0, 1), (1, 0), (1, 1)})
+        self.assertEqual(ai.moves_made, {(0, 0)})
+        self.assertEqual(ai.make_safe_move(), (0, 1))
+
+    def test_full_count_marks_neighbors_mines(self):
+        ai = MinesweeperAI(4, 5)
+        ai.add_knowledge((3, 4), 3)
+        self.assertEqual(ai.mines, {(2, 3), (2, 4), (3, 3)})
+        self.assertEqual(len(ai.knowledge), 0)
+
+    def test_subset_inference(self):
+        # (0, 0) says one mine is in {(0, 1), (1, 0), (1, 1)}, and (0, 1)
+        # then says the same mine is the only one around it
+        ai = MinesweeperAI(3, 3)
+        ai.add_knowledge((0, 0), 1)
+        ai.add_knowledge((0, 1), 1)
+        self.assertEqual(ai.safes, {(0, 0), (0, 1), (0, 2), (1, 2)})
+        self.assertEqual(ai.mines, set())
+        self.assertIn(Sentence({(1, 0), (1, 1)}, 1), ai.knowledge)
+
+    def test_knowledge_membership(self):
+        ai = MinesweeperAI(4, 5)
+        ai.add_knowledge((2, 2), 3)
+        cells = {(1, 1), (1, 2), (1, 3), (2, 1), (2, 3), (3, 1), (3, 2), (3, 3)}
+        self.assertIn(Sentence(cells, 3), ai.knowledge)
+        self.assertNotIn(Sentence(cells, 2), ai.knowledge)
+
+    def test_cells_off_the_board(self):
+        ai = MinesweeperAI(4, 5)
+        for cell in ((4, 0), (0, 5), (-1, 0)):
+            with self.assertRaises(ValueError):
+                ai.mark_mine(cell)
+
+    def test_mine_total_marks_the_rest_safe(self):
+        ai = MinesweeperAI(2, 2, total_mines=1)
+        ai.mark_mine((1, 1))
+        self.assertEqual(ai.safes, {(0, 0), (0, 1), (1, 0)})
+
+        ai = MinesweeperAI(1, 1, total_mines=0)
+        self.assertEqual(ai.make_safe_move(), (0, 0))
+
+    def test_matches_naive_fixpoint(self):
+        # Reveal every safe cell of random games in a random order and
+        # compare each step with the reference player
+        rng = random.Random(0)
+        for height, width, mines in ((8, 8, 10), (9, 13, 20), (16, 16, 40)):
+            for _ in range(5):
+                random.seed(rng.random())
+                game = Minesweeper(height, width, mines)
+                ai = MinesweeperAI(height, width)
+                naive = NaiveAI(height, width)
+                cells = [
+                    (i, j)
+                    for i in range(height)
+                    for j in range(width)
+                    if not game.is_mine((i, j))
+                ]
+                rng.shuffle(cells)
+                for cell in cells:
+                    count = game.nearby_mines(cell)
+                    ai.add_knowledge(cell, count)
+                    naive.add_knowledge(cell, count)
+                    self.assertEqual(ai.safes, naive.safes)
+                    self.assertEqual(ai.mines, naive.mines)
+                    self.assertLessEqual(ai.mines, game.mines)
+                    self.assertFalse(ai.safes & game.mines)
+
+
+if __name__ == "__main__":
+    unittest.main()